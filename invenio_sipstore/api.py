@@ -5,14 +5,15 @@
 
 import json
 
-from flask import current_app, has_request_context, request
+from flask import has_request_context, request
 from flask_login import current_user
 from invenio_db import db
-from werkzeug.utils import import_string
+from sqlalchemy.orm import subqueryload
 
 from invenio_sipstore.models import SIP as SIP_
 from invenio_sipstore.models import RecordSIP as RecordSIP_
 from invenio_sipstore.models import SIPFile, SIPMetadata, SIPMetadataType
+from invenio_sipstore.proxies import current_sipstore
 from invenio_sipstore.signals import sipstore_created
 
 
@@ -153,9 +154,7 @@ class SIP(object):
             user_id = (None if not current_user or current_user.is_anonymous
                        else current_user.get_id())
         if not agent:
-            agent_factory = import_string(
-                current_app.config['SIPSTORE_AGENT_FACTORY'])
-            agent = agent_factory()
+            agent = current_sipstore.agent_factory()
         files = [] if not files else files
         metadata = {} if not metadata else metadata
 
@@ -171,8 +170,17 @@ class SIP(object):
 
     @classmethod
     def get_sip(cls, uuid):
-        """Get a SIP API object from the UUID if a model object."""
-        return cls(SIP_.query.filter_by(id=uuid).one())
+        """Get a SIP API object from the UUID if a model object.
+
+        The SIP files (with their file instances) and metadata (with their
+        types) are loaded together with the SIP, so that generating the
+        archive files information of the returned SIP does not issue a query
+        for each of its files.
+        """
+        return cls(SIP_.query.filter_by(id=uuid).options(
+            subqueryload(SIP_.sip_files).joinedload(SIPFile.file),
+            subqueryload(SIP_.sip_metadata).joinedload(SIPMetadata.type),
+        ).one())
 
 
 class RecordSIP(object):
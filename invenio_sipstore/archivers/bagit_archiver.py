@@ -12,7 +12,6 @@ from flask import current_app
 from invenio_db import db
 from jsonschema import validate
 from six import string_types
-from werkzeug.utils import import_string
 
 from invenio_sipstore.api import SIP
 from invenio_sipstore.archivers import BaseArchiver
@@ -204,9 +203,7 @@ class BagItArchiver(BaseArchiver):
 
         # Include agent tags
         if self.sip.agent:
-            agent_tags_factory = import_string(
-                    current_app.config['SIPSTORE_AGENT_TAGS_FACTORY'])
-            agent_tags = agent_tags_factory(self.sip.agent)
+            agent_tags = self._sipstore.agent_tags_factory(self.sip.agent)
 
             for k, v in agent_tags:
                 content.append("{0}: {1}".format(k, v))
@@ -10,6 +10,7 @@ to worry about e.g. files to disk.
 from __future__ import absolute_import, print_function, unicode_literals
 
 import os
+from functools import partial
 from hashlib import md5
 
 from flask import current_app
@@ -21,6 +22,14 @@ from ..api import SIP
 from ..models import SIPMetadata
 from ..signals import sipstore_archiver_status
 
+try:
+    md5(usedforsecurity=False)
+except TypeError:  # Python < 3.9
+    _md5 = md5
+else:
+    # The checksums are not used for security, skip the FIPS policy checks
+    _md5 = partial(md5, usedforsecurity=False)
+
 
 class BaseArchiver(object):
     """Base archiver.
@@ -90,12 +99,16 @@ class BaseArchiver(object):
         :param filenames_mapping_file: Mapping of file names.
         """
         self.sip = sip if isinstance(sip, SIP) else SIP(sip)
+        # Resolve the SIPStore state only once instead of going through the
+        # proxy on every access.
+        self._sipstore = current_sipstore._get_current_object()
         self.data_dir = data_dir
         self.metadata_dir = metadata_dir
         self.extra_dir = extra_dir
         self.storage_factory = storage_factory or \
-            current_sipstore.storage_factory
+            self._sipstore.storage_factory
         self.filenames_mapping_file = filenames_mapping_file
+        self._archive_subpath = None
 
     def get_archive_base_uri(self):
         """Get the base URI (absolute path) for the archive location.
@@ -110,7 +123,7 @@ class BaseArchiver(object):
         * ``/data/archive/``
         * ``root://eospublic.cern.ch//eos/archive``
         """
-        return current_sipstore.archive_location
+        return self._sipstore.archive_location
 
     def get_archive_subpath(self):
         """Generate the relative directory path of the archived SIP.
@@ -134,8 +147,14 @@ class BaseArchiver(object):
 
         * ``/data/archive/ab/cd/ab12-abcd-1234-dcba-123412341234``
         * ``root://eospublic.cern.ch//eos/archive/12345/r/5``
+
+        The path is built only once per archiver, as it is needed for every
+        archived file.
         """
-        return os.path.join(*current_sipstore.archive_path_builder(self.sip))
+        if self._archive_subpath is None:
+            self._archive_subpath = os.path.join(
+                *self._sipstore.archive_path_builder(self.sip))
+        return self._archive_subpath
 
     def get_fullpath(self, filepath):
         """Generate the absolute (full path) to the file in the archive system.
@@ -155,7 +174,7 @@ class BaseArchiver(object):
 
     def _generate_sipfile_info(self, sipfile):
         """Generate the file information dictionary from a SIP file."""
-        filename = current_sipstore.sipfile_name_formatter(sipfile)
+        filename = self._sipstore.sipfile_name_formatter(sipfile)
         filepath = os.path.join(self.data_dir, filename)
         return dict(
             checksum=sipfile.checksum,
@@ -169,11 +188,11 @@ class BaseArchiver(object):
 
     def _generate_sipmetadata_info(self, sipmetadata):
         """Generate the file information dictionary from a SIP metadata."""
-        filename = current_sipstore.sipmetadata_name_formatter(sipmetadata)
+        filename = self._sipstore.sipmetadata_name_formatter(sipmetadata)
         filepath = os.path.join(self.metadata_dir, filename)
         return dict(
             checksum='md5:{}'.format(str(
-                md5(sipmetadata.content.encode('utf-8')).hexdigest())),
+                _md5(sipmetadata.content.encode('utf-8')).hexdigest())),
             size=len(sipmetadata.content),
             filepath=filepath,
             fullpath=self.get_fullpath(filepath),
@@ -185,7 +204,7 @@ class BaseArchiver(object):
         filepath = os.path.join(self.extra_dir, filename)
         return dict(
             checksum='md5:{}'.format(
-                    str(md5(content.encode('utf-8')).hexdigest())),
+                    str(_md5(content.encode('utf-8')).hexdigest())),
             size=len(content),
             filepath=filepath,
             fullpath=self.get_fullpath(filepath),
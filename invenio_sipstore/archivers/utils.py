@@ -5,14 +5,44 @@
 
 from __future__ import absolute_import, print_function
 
-from werkzeug.utils import secure_filename
+import os
+import string
+import unicodedata
+
+import six
+
+_SAFE_CHARACTERS = frozenset(string.ascii_letters + string.digits + '_.-')
+"""Characters which are allowed in a secure filename."""
+
+_UNSAFE_CHARACTERS = ''.join(
+    c for c in map(chr, range(256)) if c not in _SAFE_CHARACTERS)
+"""Characters which are removed from a secure filename."""
+
+_UNSAFE_CHARACTERS_TABLE = dict((ord(c), None) for c in _UNSAFE_CHARACTERS)
+"""Translation table removing the unsafe characters from a text."""
+
+_SEPARATORS = ''.join(sep for sep in (os.path.sep, os.path.altsep) if sep)
+_SEPARATORS_TABLE = (string.maketrans if six.PY2 else str.maketrans)(
+    _SEPARATORS, ' ' * len(_SEPARATORS))
+"""Translation table replacing the path separators with spaces."""
+
+_WINDOWS_DEVICE_FILES = frozenset(
+    ['CON', 'PRN', 'AUX', 'NUL'] +
+    ['COM{0}'.format(i) for i in range(1, 10)] +
+    ['LPT{0}'.format(i) for i in range(1, 10)])
+"""Special device names on Windows systems."""
+
+_SECURE_FILENAME_CACHE_SIZE = 4096
+"""Maximum number of memoized secure filenames."""
+
+_secure_filename_cache = {}
 
 
 def chunks(iterable, n):
     """Yield iterable split into chunks.
 
     If 'n' is an integer, yield the iterable as n-sized chunks.
-    If 'n' is a list of integers, yield chunks of sizes: n[0],
+    If 'n' is a list or tuple of integers, yield chunks of sizes: n[0],
     n[1], ..., len(iterable) - sum(n)
 
     >>> from invenio_sipstore.archivers.utils import chunks
@@ -23,17 +53,62 @@ def chunks(iterable, n):
     >>> list(chunks('abcdefg', [1, 2, 3]))
     ['a', 'bc', 'def', 'g']
     """
+    length = len(iterable)
     if isinstance(n, int):
-        for i in range(0, len(iterable), n):
+        for i in range(0, length, n):
             yield iterable[i:i + n]
-    elif isinstance(n, list):
-        acc = 0
-        if sum(n) < len(iterable):
-            n.append(len(iterable))
-        for i in n:
-            if acc < len(iterable):
-                yield iterable[acc: acc + i]
-                acc += i
+    elif isinstance(n, (list, tuple)):
+        # Precompute the chunk boundaries once, without modifying 'n'
+        offsets = [0]
+        for size in n:
+            offsets.append(offsets[-1] + size)
+        if offsets[-1] < length:
+            offsets.append(length)
+        for start, stop in zip(offsets, offsets[1:]):
+            if start >= length:
+                break
+            yield iterable[start:stop]
+
+
+def secure_filename(filename):
+    """Return a secure version of a filename.
+
+    Equivalent of ``werkzeug.utils.secure_filename``: the filename is
+    normalized to ASCII, path separators and whitespace are replaced with
+    underscores and any other unsafe character is removed.
+    """
+    if isinstance(filename, six.text_type):
+        filename = unicodedata.normalize('NFKD', filename).encode(
+            'ascii', 'ignore')
+        if not six.PY2:
+            filename = filename.decode('ascii')
+    filename = '_'.join(filename.translate(_SEPARATORS_TABLE).split())
+    if six.PY2:
+        filename = filename.translate(None, _UNSAFE_CHARACTERS)
+    else:
+        filename = filename.translate(_UNSAFE_CHARACTERS_TABLE)
+    filename = filename.strip('._')
+    if os.name == 'nt' and filename and \
+            filename.split('.')[0].upper() in _WINDOWS_DEVICE_FILES:
+        filename = '_' + filename
+    return str(filename)
+
+
+def _secure_filename(filepath):
+    """Return the secure version of a filepath, memoized per filepath.
+
+    The same filepaths are usually archived multiple times (e.g. files shared
+    between the subsequent SIPs of a record), so the result of
+    ``secure_filename`` is cached. The cache is reset once it grows beyond
+    ``_SECURE_FILENAME_CACHE_SIZE`` entries.
+    """
+    try:
+        return _secure_filename_cache[filepath]
+    except KeyError:
+        if len(_secure_filename_cache) >= _SECURE_FILENAME_CACHE_SIZE:
+            _secure_filename_cache.clear()
+        name = _secure_filename_cache[filepath] = secure_filename(filepath)
+        return name
 
 
 def default_archive_directory_builder(sip):
@@ -47,7 +122,8 @@ def default_archive_directory_builder(sip):
     :type SIP: invenio_sipstore.models.SIP
     :returns: list of str
     """
-    return list(chunks(str(sip.id), [2, 2, ]))
+    sip_id = str(sip.id)
+    return [sip_id[:2], sip_id[2:4], sip_id[4:]]
 
 
 def default_sipmetadata_name_formatter(sipmetadata):
@@ -82,10 +158,9 @@ def secure_sipfile_name_formatter(sipfile):
     contains only ASCII characters.
     Since this operation can cause name collisions, the UUID of the
     underlying FileInstance is appended as prefix of the filename.
-    For more information on the ``secure_filename`` function visit:
+    The filename is secured with :py:func:`secure_filename`, which follows
+    ``werkzeug.utils.secure_filename``, for more information visit:
     ``http://werkzeug.pocoo.org/docs/utils/#werkzeug.utils.secure_filename``
     """
-    return "{uuid}-{name}".format(
-        uuid=str(sipfile.file_id),
-        name=secure_filename(sipfile.filepath)
-    )
+    return '-'.join((str(sipfile.file_id),
+                     _secure_filename(sipfile.filepath)))
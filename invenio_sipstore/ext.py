@@ -5,7 +5,6 @@
 
 from __future__ import absolute_import, print_function
 
-from invenio_files_rest.models import Location
 from werkzeug.utils import cached_property
 
 from . import config
@@ -26,6 +25,20 @@ class _InvenioSIPStoreState(object):
             'SIPSTORE_FILE_STORAGE_FACTORY', app=self.app
         )
 
+    @cached_property
+    def agent_factory(self):
+        """Load the SIP agent factory."""
+        return load_or_import_from_config(
+            'SIPSTORE_AGENT_FACTORY', app=self.app
+        )
+
+    @cached_property
+    def agent_tags_factory(self):
+        """Load the agent information tags factory."""
+        return load_or_import_from_config(
+            'SIPSTORE_AGENT_TAGS_FACTORY', app=self.app
+        )
+
     @cached_property
     def archive_location(self):
         """Return the archive location URI.
@@ -33,6 +46,9 @@ class _InvenioSIPStoreState(object):
         :rtype: str
         :return: URI to the archive root.
         """
+        # Imported here, as loading the models is costly and not needed
+        # for merely importing the package.
+        from invenio_files_rest.models import Location
         name = self.app.config['SIPSTORE_ARCHIVER_LOCATION_NAME']
         return Location.query.filter_by(name=name).one().uri
 
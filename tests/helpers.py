@@ -7,6 +7,25 @@
 from __future__ import absolute_import, print_function
 
 
+def index_files(result):
+    """Index the files from the results list by their filename.
+
+    Entries without a filename (e.g. metadata files) are skipped.
+    """
+    return dict((f['filename'], f) for f in result if 'filename' in f)
+
+
+def index_sipfiles(sip):
+    """Index the SIP files by the base name of their filepath.
+
+    The base names have to be unique within the SIP, as otherwise the index
+    would silently keep only the last of the clashing files.
+    """
+    index = dict((f.filepath.rsplit('/', 1)[-1], f) for f in sip.files)
+    assert len(index) == len(sip.files), 'SIP file base names are not unique'
+    return index
+
+
 def get_file(filename, result):
     """Get a file by its filename from the results list."""
     return next((f for f in result if f['filename'] == filename), None)
@@ -7,18 +7,18 @@
 from __future__ import absolute_import, print_function
 
 import json
-import tempfile
 import uuid
-from shutil import rmtree
 
 from invenio_accounts.testutils import create_test_user
-from invenio_files_rest.models import Bucket, Location, ObjectVersion
+from invenio_files_rest.models import Bucket, ObjectVersion
 from invenio_pidstore.models import PersistentIdentifier, PIDStatus
 from invenio_records_files.api import Record
 from invenio_records_files.models import RecordsBuckets
 from six import BytesIO
+from sqlalchemy import event
 
 from invenio_sipstore.api import SIP, RecordSIP
+from invenio_sipstore.archivers import BaseArchiver
 from invenio_sipstore.models import SIP as SIP_
 from invenio_sipstore.models import RecordSIP as RecordSIP_
 from invenio_sipstore.models import SIPFile, SIPMetadata, SIPMetadataType
@@ -48,7 +48,29 @@ def test_SIP(db):
     assert api_sip2.id == api_sip.id
 
 
-def test_SIP_files(db):
+def test_SIP_get_sip_queries(db, sips):
+    """Test that the SIP files and metadata are loaded with the SIP."""
+    sip_id = sips[2].id
+    db.session.expunge_all()
+    sip = SIP.get_sip(sip_id)
+    archiver = BaseArchiver(sip)
+    # The archive location is looked up (and cached) only once
+    archiver.get_archive_base_uri()
+    queries = []
+
+    def count_query(*args):
+        queries.append(args)
+
+    event.listen(db.engine, 'before_cursor_execute', count_query)
+    try:
+        files = archiver.get_all_files()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count_query)
+    assert len(files) == 4
+    assert not queries
+
+
+def test_SIP_files(db, locations):
     """Test the files methods of API SIP."""
     # we create a SIP model
     sip = SIP_.create()
@@ -56,10 +78,6 @@ def test_SIP_files(db):
     # We create an API SIP on top of it
     api_sip = SIP(sip)
     assert len(api_sip.files) == 0
-    # we setup a file storage
-    tmppath = tempfile.mkdtemp()
-    db.session.add(Location(name='default', uri=tmppath, default=True))
-    db.session.commit()
     # we create a file
     content = b'test lol\n'
     bucket = Bucket.create()
@@ -71,8 +89,6 @@ def test_SIP_files(db):
     assert len(api_sip.files) == 1
     assert api_sip.files[0].filepath == 'test.txt'
     assert sip.sip_files[0].filepath == 'test.txt'
-    # finalization
-    rmtree(tmppath)
 
 
 def test_SIP_metadata(db):
@@ -120,12 +136,8 @@ def test_SIP_build_agent_info(app, mocker):
     }
 
 
-def test_SIP_create(app, db, mocker):
+def test_SIP_create(app, db, locations, mocker):
     """Test the create method from SIP API."""
-    # we setup a file storage
-    tmppath = tempfile.mkdtemp()
-    db.session.add(Location(name='default', uri=tmppath, default=True))
-    db.session.commit()
     # we create a file
     content = b'test lol\n'
     bucket = Bucket.create()
@@ -165,8 +177,6 @@ def test_SIP_create(app, db, mocker):
     assert sip.model.user_id is None
     assert sip.user is None
     assert sip.agent == {}
-    # finalization
-    rmtree(tmppath)
 
 
 def test_RecordSIP(db):
@@ -193,11 +203,8 @@ def test_RecordSIP(db):
     assert api_recordsip.sip.id == sip.id
 
 
-def test_RecordSIP_create(db, mocker):
+def test_RecordSIP_create(db, locations, mocker):
     """Test create method from the API class RecordSIP."""
-    # we setup a file storage
-    tmppath = tempfile.mkdtemp()
-    db.session.add(Location(name='default', uri=tmppath, default=True))
     # setup metadata
     mtype = SIPMetadataType(title='JSON Test', name='json-test',
                             format='json', schema='url://to/schema')
@@ -258,6 +265,3 @@ def test_RecordSIP_create(db, mocker):
     assert SIPMetadata.query.count() == 3
     assert len(rsip.sip.metadata) == 1
     assert rsip.sip.metadata[0].type.id == mtype.id
-
-    # finalization
-    rmtree(tmppath)
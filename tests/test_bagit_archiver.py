@@ -5,18 +5,21 @@
 
 from __future__ import absolute_import, print_function
 
+from collections import namedtuple
 from datetime import datetime
 from hashlib import md5
 
 import pytest
+from helpers import index_files, index_sipfiles
 
 from invenio_sipstore.api import SIP as SIPApi
 from invenio_sipstore.archivers import BagItArchiver, BaseArchiver
 
+_CHECKSUM = md5
+"""Checksum algorithm of the BagItArchiver manifests."""
 
-def fetch_file_endswith(sip, filename_suffix):
-    """A helper method for fetching SIPFiles by the name suffix."""
-    return next(f for f in sip.files if f.filepath.endswith(filename_suffix))
+_FileInfo = namedtuple('_FileInfo', ['checksum', 'size', 'filepath'])
+"""Checksum, size and path of an archived file."""
 
 
 def test_constructor(sips):
@@ -48,6 +51,9 @@ def test_get_all_files(sips):
     archiver = BagItArchiver(sips[0])
     files = archiver.get_all_files()
     assert len(files) == 9
+    data_files = index_files(files)
+    assert list(data_files.keys()) == ['foobar.txt']
+    assert data_files['foobar.txt']['filepath'] == 'data/files/foobar.txt'
 
 
 def test_write_all_files(sips, archive_fs):
@@ -58,14 +64,14 @@ def test_write_all_files(sips, archive_fs):
     archiver.write_all_files()
     assert len(archive_fs.listdir()) == 1
     fs = archive_fs.opendir(archiver.get_archive_subpath())
-    assert set(fs.listdir()) == \
-        set(['tagmanifest-md5.txt', 'bagit.txt', 'manifest-md5.txt',
-             'bag-info.txt', 'data', ])
-    assert set(fs.listdir('data')) == \
-        set(['metadata', 'files', 'filenames.txt'])
-    assert set(fs.listdir('data/metadata')) == \
-        set(['marcxml-test.xml', 'json-test.json', 'txt-test.txt'])
-    assert set(fs.listdir('data/files')) == set(['foobar.txt', ])
+    assert sorted(fs.listdir()) == \
+        ['bag-info.txt', 'bagit.txt', 'data', 'manifest-md5.txt',
+         'tagmanifest-md5.txt', ]
+    assert sorted(fs.listdir('data')) == \
+        ['filenames.txt', 'files', 'metadata']
+    assert sorted(fs.listdir('data/metadata')) == \
+        ['json-test.json', 'marcxml-test.xml', 'txt-test.txt']
+    assert sorted(fs.listdir('data/files')) == ['foobar.txt', ]
 
 
 def test_save_bagit_metadata(sips):
@@ -92,13 +98,31 @@ def test_save_bagit_metadata(sips):
 
 
 def _read_file(fs, filepath):
-    with fs.open(filepath, 'r') as fp:
-        content = fp.read()
-    return {
-        'checksum': md5(content.encode('utf-8')).hexdigest(),
-        'size': len(content),
-        'filepath': filepath,
-    }
+    content = fs.getcontents(filepath, 'rb')
+    return _FileInfo(_CHECKSUM(content).hexdigest(), len(content), filepath)
+
+
+def _manifest(payload):
+    """Build the expected manifest entries of the payload files."""
+    return set("{0.checksum} {0.filepath}".format(f) for f in payload)
+
+
+def _payload_oxum(payload):
+    """Build the expected Payload-Oxum of the payload files."""
+    return '{0}.{1}'.format(sum(f.size for f in payload), len(payload))
+
+
+def _cached_file_reader():
+    """Create a version of ``_read_file`` memoized on the fs and filepath."""
+    cache = {}
+
+    def read_file(fs, filepath):
+        key = (id(fs), filepath)
+        if key not in cache:
+            # Keep a reference to 'fs', so that its id cannot be reused
+            cache[key] = (fs, _read_file(fs, filepath))
+        return cache[key][1]
+    return read_file
 
 
 def test_write_patched(mocker, sips, archive_fs,
@@ -129,58 +153,77 @@ def test_write_patched(mocker, sips, archive_fs,
     assert len(fs2.listdir()) == 6  # Includes 'fetch.txt'
     assert len(fs3.listdir()) == 6  # Includes 'fetch.txt'
     assert len(fs5.listdir()) == 6  # Includes 'fetch.txt'
+    # Same files are referred to by multiple manifests, read them only once
+    read_file = _cached_file_reader()
 
     # Check SIP-1,2,3,5 data contents
-    assert set(fs1.listdir('data')) == \
-        set(['files', 'metadata', 'filenames.txt'])
+    assert sorted(fs1.listdir('data')) == \
+        ['filenames.txt', 'files', 'metadata']
     assert len(fs1.listdir('data/files')) == 1
     assert len(fs1.listdir('data/metadata')) == 3
 
-    assert set(fs2.listdir('data')) == \
-        set(['files', 'metadata', 'filenames.txt'])
+    assert sorted(fs2.listdir('data')) == \
+        ['filenames.txt', 'files', 'metadata']
     assert len(fs2.listdir('data/files')) == 1
     assert len(fs2.listdir('data/metadata')) == 2
 
-    assert set(fs3.listdir('data')) == \
-        set(['files', 'metadata', 'filenames.txt'])
+    assert sorted(fs3.listdir('data')) == \
+        ['filenames.txt', 'files', 'metadata']
     assert len(fs3.listdir('data/files')) == 1
     assert len(fs3.listdir('data/metadata')) == 2
 
-    assert set(fs5.listdir('data')) == \
-        set(['metadata', 'filenames.txt'])
+    assert sorted(fs5.listdir('data')) == ['filenames.txt', 'metadata']
     assert len(fs5.listdir('data/metadata')) == 1
 
     # Fetch the filenames for easier fixture formatting below
-    file1_fn = '{0}-foobar.txt'.format(
-        fetch_file_endswith(sips[0], 'foobar.txt').file_id)
-    file2_fn = '{0}-foobar2.txt'.format(
-        fetch_file_endswith(sips[1], 'foobar2.txt').file_id)
-    file3_fn = '{0}-foobar3.txt'.format(
-        fetch_file_endswith(sips[2], 'foobar3.txt').file_id)
+    sip1_files, sip2_files, sip3_files = \
+        [index_sipfiles(sip) for sip in sips[:3]]
+    file1_fn = '{0}-foobar.txt'.format(sip1_files['foobar.txt'].file_id)
+    file2_fn = '{0}-foobar2.txt'.format(sip2_files['foobar2.txt'].file_id)
+    file3_fn = '{0}-foobar3.txt'.format(sip3_files['foobar3.txt'].file_id)
     file2_rn_fn = '{0}-foobar2-renamed.txt'.format(
-        fetch_file_endswith(sips[2], 'foobar2-renamed.txt').file_id)
+        sip3_files['foobar2-renamed.txt'].file_id)
 
     assert file2_fn[:36] == file2_rn_fn[:36]
     # Both file2_fn and file2_rn_fn are referring to the same FileInstance,
     # so their UUID prefix should match
+    f1_dp = 'data/files/{0}'.format(file1_fn)
+    f2_dp = 'data/files/{0}'.format(file2_fn)
+    f2_rn_dp = 'data/files/{0}'.format(file2_rn_fn)
+    f3_dp = 'data/files/{0}'.format(file3_fn)
+    # System paths of the data files which are fetched by the later SIPs
+    f1_sp = fs1.getsyspath(f1_dp)
+    f2_sp = fs2.getsyspath(f2_dp)
+    f3_sp = fs3.getsyspath(f3_dp)
+
+    # Information on the data files shared between the SIPs
+    f1_info = read_file(fs1, f1_dp)
+    # Manifest also specifies the renamed filename for File-2
+    f2_rn_info = read_file(fs2, f2_dp)._replace(filepath=f2_rn_dp)
+    f3_info = read_file(fs3, f3_dp)
+
+    # Payload files of each SIP, as listed in the manifest
+    sip1_payload = [f1_info] + [read_file(fs1, fp) for fp in (
+        'data/metadata/marcxml-test.xml', 'data/metadata/json-test.json',
+        'data/metadata/txt-test.txt', 'data/filenames.txt')]
+    sip2_payload = [f1_info] + [read_file(fs2, fp) for fp in (
+        f2_dp, 'data/metadata/marcxml-test.xml',
+        'data/metadata/json-test.json', 'data/filenames.txt')]
+    sip3_payload = [f1_info, f2_rn_info, f3_info] + [
+        read_file(fs3, fp) for fp in (
+            'data/metadata/marcxml-test.xml', 'data/metadata/json-test.json',
+            'data/filenames.txt')]
+    sip5_payload = [f1_info, f2_rn_info, f3_info] + [
+        read_file(fs5, fp) for fp in (
+            'data/metadata/marcxml-test.xml', 'data/filenames.txt')]
+
     expected_sip1 = [
-        ('data/files/{0}'.format(file1_fn), 'test'),
+        (f1_dp, 'test'),
         ('data/metadata/marcxml-test.xml', '<p>XML 1</p>'),
         ('data/metadata/json-test.json', '{"title": "JSON 1"}'),
         ('bagit.txt',
             'BagIt-Version: 0.97\nTag-File-Character-Encoding: UTF-8'),
-        ('manifest-md5.txt', set([
-            "{checksum} {filepath}".format(
-                **_read_file(fs1, 'data/files/{0}'.format(file1_fn))),
-            "{checksum} {filepath}".format(
-                **_read_file(fs1, 'data/metadata/marcxml-test.xml')),
-            "{checksum} {filepath}".format(
-                **_read_file(fs1, 'data/metadata/json-test.json')),
-            "{checksum} {filepath}".format(
-                **_read_file(fs1, 'data/metadata/txt-test.txt')),
-            "{checksum} {filepath}".format(
-                **_read_file(fs1, 'data/filenames.txt')),
-        ])),
+        ('manifest-md5.txt', _manifest(sip1_payload)),
         ('data/filenames.txt', set([
             '{0} foobar.txt'.format(file1_fn),
         ])),
@@ -188,7 +231,7 @@ def test_write_patched(mocker, sips, archive_fs,
             "Source-Organization: European Organization for Nuclear Research\n"
             "Organization-Address: CERN, CH-1211 Geneva 23, Switzerland\n"
             "Bagging-Date: {0}\n".format(dt) +
-            "Payload-Oxum: 105.5\n"
+            "Payload-Oxum: {0}\n".format(_payload_oxum(sip1_payload)) +
             "External-Identifier: {0}/SIPBagIt-v1.0.0\n".format(sips[0].id) +
             "External-Description: BagIt archive of SIP.\n"
             "X-Agent-Email: spiderpig@invenio.org\n"
@@ -197,27 +240,15 @@ def test_write_patched(mocker, sips, archive_fs,
         )),
     ]
     expected_sip2 = [
-        ('data/files/{0}'.format(file2_fn), 'test-second'),
+        (f2_dp, 'test-second'),
         ('data/metadata/marcxml-test.xml', '<p>XML 2</p>'),
         ('data/metadata/json-test.json', '{"title": "JSON 2"}'),
         ('bagit.txt',
             'BagIt-Version: 0.97\nTag-File-Character-Encoding: UTF-8'),
-        ('fetch.txt', set(["{0} {1} {2}".format(
-            fs1.getsyspath('data/files/{0}'.format(file1_fn)),
-            4, 'data/files/{0}'.format(file1_fn)),
-        ])),
-        ('manifest-md5.txt', set([
-            "{checksum} {filepath}".format(
-                **_read_file(fs1, 'data/files/{0}'.format(file1_fn))),
-            "{checksum} {filepath}".format(
-                **_read_file(fs2, 'data/files/{0}'.format(file2_fn))),
-            "{checksum} {filepath}".format(
-                **_read_file(fs2, 'data/metadata/marcxml-test.xml')),
-            "{checksum} {filepath}".format(
-                **_read_file(fs2, 'data/metadata/json-test.json')),
-            "{checksum} {filepath}".format(
-                **_read_file(fs2, 'data/filenames.txt')),
+        ('fetch.txt', set([
+            "{0} {1} {2}".format(f1_sp, 4, f1_dp),
         ])),
+        ('manifest-md5.txt', _manifest(sip2_payload)),
         ('data/filenames.txt', set([
             '{0} foobar.txt'.format(file1_fn),
             '{0} foobar2.txt'.format(file2_fn),
@@ -226,45 +257,26 @@ def test_write_patched(mocker, sips, archive_fs,
             "Source-Organization: European Organization for Nuclear Research\n"
             "Organization-Address: CERN, CH-1211 Geneva 23, Switzerland\n"
             "Bagging-Date: {0}\n".format(dt) +
-            "Payload-Oxum: 165.5\n"
+            "Payload-Oxum: {0}\n".format(_payload_oxum(sip2_payload)) +
             "External-Identifier: {0}/SIPBagIt-v1.0.0\n".format(sips[1].id) +
             "External-Description: BagIt archive of SIP."
         )),
     ]
     expected_sip3 = [
-        ('data/files/{0}'.format(file3_fn), 'test-third'),
+        (f3_dp, 'test-third'),
         ('data/metadata/marcxml-test.xml', '<p>XML 3</p>'),
         ('data/metadata/json-test.json', '{"title": "JSON 3"}'),
         ('bagit.txt',
             'BagIt-Version: 0.97\nTag-File-Character-Encoding: UTF-8'),
         ('fetch.txt', set([
-            "{0} {1} {2}".format(
-                fs1.getsyspath('data/files/{0}'.format(file1_fn)),
-                4, 'data/files/{0}'.format(file1_fn)),
+            "{0} {1} {2}".format(f1_sp, 4, f1_dp),
             # Explanation on entry below: The file is fetched using original
             # filename (file2_fn) as it will be archived in SIP-2, however
             # the new destination has the 'renamed' filename (file2_rn_fn).
             # This is correct and expected behaviour
-            "{0} {1} {2}".format(
-                fs2.getsyspath('data/files/{0}'.format(file2_fn)),
-                11, 'data/files/{0}'.format(file2_rn_fn)),
-        ])),
-        ('manifest-md5.txt', set([
-            "{checksum} {filepath}".format(
-                **_read_file(fs1, 'data/files/{0}'.format(file1_fn))),
-            # Manifest also specifies the renamed filename for File-2
-            "{checksum} data/files/{newfilename}".format(
-                newfilename=file2_rn_fn,
-                **_read_file(fs2, 'data/files/{0}'.format(file2_fn))),
-            "{checksum} {filepath}".format(
-                **_read_file(fs3, 'data/files/{0}'.format(file3_fn))),
-            "{checksum} {filepath}".format(
-                **_read_file(fs3, 'data/metadata/marcxml-test.xml')),
-            "{checksum} {filepath}".format(
-                **_read_file(fs3, 'data/metadata/json-test.json')),
-            "{checksum} {filepath}".format(
-                **_read_file(fs3, 'data/filenames.txt')),
+            "{0} {1} {2}".format(f2_sp, 11, f2_rn_dp),
         ])),
+        ('manifest-md5.txt', _manifest(sip3_payload)),
         ('data/filenames.txt', set([
             '{0} foobar.txt'.format(file1_fn),
             '{0} foobar2.txt'.format(file2_fn),
@@ -274,7 +286,7 @@ def test_write_patched(mocker, sips, archive_fs,
             "Source-Organization: European Organization for Nuclear Research\n"
             "Organization-Address: CERN, CH-1211 Geneva 23, Switzerland\n"
             "Bagging-Date: {0}\n".format(dt) +
-            "Payload-Oxum: 236.6\n"
+            "Payload-Oxum: {0}\n".format(_payload_oxum(sip3_payload)) +
             "External-Identifier: {0}/SIPBagIt-v1.0.0\n".format(sips[2].id) +
             "External-Description: BagIt archive of SIP."
         )),
@@ -285,34 +297,15 @@ def test_write_patched(mocker, sips, archive_fs,
         ('bagit.txt',
             'BagIt-Version: 0.97\nTag-File-Character-Encoding: UTF-8'),
         ('fetch.txt', set([
-            "{0} {1} {2}".format(
-                fs1.getsyspath('data/files/{0}'.format(file1_fn)),
-                4, 'data/files/{0}'.format(file1_fn)),
+            "{0} {1} {2}".format(f1_sp, 4, f1_dp),
             # As in "expected_sip3" above, the file is fetched using original
             # filename (file2_fn) as it will be archived in SIP-2, however
             # the new destination has the 'renamed' filename (file2_rn_fn).
             # This is correct and expected behaviour
-            "{0} {1} {2}".format(
-                fs2.getsyspath('data/files/{0}'.format(file2_fn)),
-                11, 'data/files/{0}'.format(file2_rn_fn)),
-            "{0} {1} {2}".format(
-                fs3.getsyspath('data/files/{0}'.format(file3_fn)),
-                10, 'data/files/{0}'.format(file3_fn)),
-        ])),
-        ('manifest-md5.txt', set([
-            "{checksum} {filepath}".format(
-                **_read_file(fs1, 'data/files/{0}'.format(file1_fn))),
-            # Manifest also specifies the renamed filename for File-2
-            "{checksum} data/files/{newfilename}".format(
-                newfilename=file2_rn_fn,
-                **_read_file(fs2, 'data/files/{0}'.format(file2_fn))),
-            "{checksum} {filepath}".format(
-                **_read_file(fs3, 'data/files/{0}'.format(file3_fn))),
-            "{checksum} {filepath}".format(
-                **_read_file(fs5, 'data/metadata/marcxml-test.xml')),
-            "{checksum} {filepath}".format(
-                **_read_file(fs5, 'data/filenames.txt')),
+            "{0} {1} {2}".format(f2_sp, 11, f2_rn_dp),
+            "{0} {1} {2}".format(f3_sp, 10, f3_dp),
         ])),
+        ('manifest-md5.txt', _manifest(sip5_payload)),
         ('data/filenames.txt', set([
             '{0} foobar.txt'.format(file1_fn),
             '{0} foobar2.txt'.format(file2_fn),
@@ -322,7 +315,7 @@ def test_write_patched(mocker, sips, archive_fs,
             "Source-Organization: European Organization for Nuclear Research\n"
             "Organization-Address: CERN, CH-1211 Geneva 23, Switzerland\n"
             "Bagging-Date: {0}\n".format(dt) +
-            "Payload-Oxum: 227.5\n"
+            "Payload-Oxum: {0}\n".format(_payload_oxum(sip5_payload)) +
             "External-Identifier: {0}/SIPBagIt-v1.0.0\n".format(sips[4].id) +
             "External-Description: BagIt archive of SIP."
         )),
@@ -333,9 +326,13 @@ def test_write_patched(mocker, sips, archive_fs,
                          (fs3, expected_sip3),
                          (fs5, expected_sip5)]:
         for fn, exp_content in expected:
-            with fs.open(fn) as fp:
+            # Compare the raw content against the UTF-8 encoded expectation
+            with fs.open(fn, 'rb') as fp:
                 if isinstance(exp_content, set):
-                    content = set(fp.read().splitlines())
+                    content = set(line.rstrip(b'\n') for line in fp)
+                    exp_content = set(
+                        line.encode('utf-8') for line in exp_content)
                 else:
                     content = fp.read()
+                    exp_content = exp_content.encode('utf-8')
             assert content == exp_content
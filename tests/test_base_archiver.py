@@ -146,7 +146,7 @@ def test_name_formatters(db, app, sips, sip_metadata_types, locations,
     archiver.write_all_files()
     assert len(archive_fs.listdir()) == 1
     fs = archive_fs.opendir(archiver.get_archive_subpath())
-    assert set(fs.listdir()) == set(['metadata', 'files'])
+    assert sorted(fs.listdir()) == ['files', 'metadata']
     assert len(fs.listdir('metadata')) == 2
     # inside 'files/' there should be 'filenames.txt' file with the mappings
     assert len(fs.listdir('files')) == 4
@@ -7,8 +7,10 @@ from __future__ import absolute_import, print_function, unicode_literals
 
 from uuid import UUID
 
+from werkzeug.utils import secure_filename as werkzeug_secure_filename
+
 from invenio_sipstore.archivers.utils import chunks, \
-    default_archive_directory_builder
+    default_archive_directory_builder, secure_filename
 from invenio_sipstore.archivers.utils import \
     secure_sipfile_name_formatter as fmt
 from invenio_sipstore.models import SIP
@@ -16,18 +18,24 @@ from invenio_sipstore.models import SIP
 
 def test_chunks():
     """Test the chunk creation utility function."""
-    assert list(chunks('123456', 2)) == ['12', '34', '56']
-    assert list(chunks('1234567', 2)) == ['12', '34', '56', '7']
-    assert list(chunks('1234567', [1, 2, 3])) == \
-        ['1', '23', '456', '7']
-    assert list(chunks('123', [1, 2, 3, 4])) == \
-        ['1', '23']
-    assert list(chunks('1234567', [1, ])) == \
-        ['1', '234567']
-    assert list(chunks('12', [1, 1, 1])) == \
-        ['1', '2']
-    assert list(chunks('1', [1, 1, 1])) == \
-        ['1', ]
+    assert tuple(chunks('123456', 2)) == ('12', '34', '56')
+    assert tuple(chunks('1234567', 2)) == ('12', '34', '56', '7')
+    assert tuple(chunks('1234567', [1, 2, 3])) == \
+        ('1', '23', '456', '7')
+    assert tuple(chunks('123', [1, 2, 3, 4])) == \
+        ('1', '23')
+    assert tuple(chunks('1234567', [1, ])) == \
+        ('1', '234567')
+    assert tuple(chunks('12', [1, 1, 1])) == \
+        ('1', '2')
+    assert tuple(chunks('1', [1, 1, 1])) == \
+        ('1', )
+    assert tuple(chunks('1234567', (1, 2, 3))) == \
+        ('1', '23', '456', '7')
+    # The list of chunk sizes should not be modified
+    sizes = [1, 2]
+    assert tuple(chunks('1234567', sizes)) == ('1', '23', '4567')
+    assert sizes == [1, 2]
 
 
 def test_default_archive_directory_builder(app, db):
@@ -63,3 +71,5 @@ def test_secure_sipfilename_formatter(app, db):
     for orig, secure in examples:
         assert fmt(MockSIPFile(sip_id, orig)) == \
             "{0}-{1}".format(sip_id, secure)
+        # Results should match the Werkzeug implementation
+        assert secure_filename(orig) == werkzeug_secure_filename(orig)